@@ -1,11 +1,15 @@
 import argparse
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
 import csv
 import logging
+import multiprocessing
 from pathlib import Path
+import signal
 import subprocess
 import sys
-import traceback
 
+from kathara_checker_scoring import labs as lab_scoring
 from kathara_checker_scoring import parsing, scoring
 from kathara_checker_scoring.models import ScoringConfig, ScoringResult
 
@@ -14,7 +18,12 @@ _logger = logging.getLogger(__name__)
 
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("-v", "--verbose", action="store_true", help="Enable more logging.")
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Enable more logging and check that no record matches multiple groups.",
+    )
     parser.add_argument("-c", "--config", required=True, type=Path, help="Path to the JSON scoring configuration file.")
     lab_or_labs_group = parser.add_mutually_exclusive_group(required=True)
     lab_or_labs_group.add_argument("--lab", type=Path, help="Path to the network scenario to score.")
@@ -33,12 +42,7 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    logging.basicConfig(
-        force=True,
-        level="DEBUG" if args.verbose else "INFO",
-        format="%(levelname)s [%(name)s] %(message)s" if args.verbose else "%(message)s",
-        stream=sys.stdout,
-    )
+    lab_scoring.configure_logging(args.verbose)
 
     lab_path: Path | None = None if args.lab is None else args.lab.resolve()
     labs_path: Path | None = None if args.labs is None else args.labs.resolve()
@@ -47,11 +51,12 @@ def main() -> None:
     if args.run_kathara:
         run_kathara(args.run_kathara, lab_path, labs_path)
     if lab_path:
-        handle_single_lab(config, lab_path.resolve(), args.show_hidden_categories)
+        handle_single_lab(config, lab_path.resolve(), args.show_hidden_categories, args.verbose)
     else:
         assert labs_path is not None
-        results = handle_multiple_labs(config, labs_path, args.show_hidden_categories)
-        save_csv_summary(labs_path / "result-scoring.csv", results)
+        handle_multiple_labs(
+            config, labs_path, args.show_hidden_categories, args.verbose, labs_path / "result-scoring.csv"
+        )
 
 
 def load_config(path: Path) -> ScoringConfig:
@@ -60,17 +65,25 @@ def load_config(path: Path) -> ScoringConfig:
         return parsing.load_config(path)
     except Exception as e:
         _logger.debug("Exception caught when loading configuration", exc_info=True)
-        _logger.error("Failed to load configuration file: %s", traceback.format_exception_only(e)[0].strip())
+        _logger.error("Failed to load configuration file: %s: %s", type(e).__name__, e)
         exit(-1)
 
 
 def run_kathara(kathara_config: Path, lab: Path | None, labs: Path | None) -> None:
-    """Runs the kathara-lab-checker application as a subprocess."""
-    cmd = [sys.executable, "-m", "kathara_lab_checker", "-c", str(kathara_config), "--no-cache", "--report-type", "csv"]
+    """
+    Runs the kathara-lab-checker application.
+    A single lab is checked in this process if possible (saving the startup of a new interpreter),
+    otherwise kathara-lab-checker is executed as a subprocess.
+    """
+    args = ["-c", str(kathara_config), "--no-cache", "--report-type", "csv"]
     if lab:
-        cmd.extend(["--lab", str(lab)])
+        args.extend(["--lab", str(lab)])
+        if _run_kathara_in_process(args):
+            return
     else:
-        cmd.extend(["--labs", str(labs)])
+        args.extend(["--labs", str(labs)])
+
+    cmd = [sys.executable, "-m", "kathara_lab_checker", *args]
     _logger.info("Executing kathara-lab-checker via the following command:")
     _logger.info("$ %s", " ".join(cmd))
 
@@ -82,61 +95,132 @@ def run_kathara(kathara_config: Path, lab: Path | None, labs: Path | None) -> No
         _logger.info("Successfully executed kathara-lab-checker")
 
 
-def score_lab(config: ScoringConfig, lab_directory: Path) -> ScoringResult:
-    """Loads the records of a single lab and computes its scores."""
-    csv_path = lab_directory / f"{lab_directory.name}_result_all.csv"
-    _logger.info("Processing '%s'...", csv_path)
+def _run_kathara_in_process(args: list[str]) -> bool:
+    """
+    Runs the kathara-lab-checker application in this process, with the specified command line arguments.
+    Returns False if kathara-lab-checker could not be imported: in this case nothing was done.
+    """
     try:
-        records = parsing.load_result_all_csv(csv_path)
-        return scoring.score(config, records)
+        from kathara_lab_checker.__main__ import main as kathara_main
+    except ImportError:
+        _logger.debug("Failed to import kathara-lab-checker, falling back to a subprocess", exc_info=True)
+        return False
+
+    _logger.info("Executing kathara-lab-checker in-process with the following arguments: %s", args)
+
+    # Subprocesses are isolated from this process: emulate that by restoring the state kathara-lab-checker may change
+    original_argv = sys.argv
+    original_sigint_handler = signal.getsignal(signal.SIGINT)
+    exit_code: int | str | None = 0
+    try:
+        sys.argv = ["kathara_lab_checker", *args]
+        kathara_main()
+    except SystemExit as e:
+        exit_code = e.code
     except Exception as e:
-        _logger.debug("Exception caught when processing lab '%s'", lab_directory.name, exc_info=True)
-        _logger.error(
-            "Failed to process lab '%s': %s", lab_directory.name, traceback.format_exception_only(e)[0].strip()
-        )
+        _logger.debug("Exception caught when executing kathara-lab-checker", exc_info=True)
+        _logger.error("kathara-lab-checker raised an exception: %s: %s", type(e).__name__, e)
+        exit_code = -1
+    finally:
+        sys.argv = original_argv
+        signal.signal(signal.SIGINT, original_sigint_handler)
+
+    if exit_code not in (None, 0):
+        _logger.error("Failed to execute kathara-lab-checker (exit code: %s)", exit_code)
         exit(-1)
+    _logger.info("Successfully executed kathara-lab-checker")
+    return True
 
 
-def handle_single_lab(config: ScoringConfig, lab: Path, show_hidden_categories: bool) -> ScoringResult:
+def handle_single_lab(config: ScoringConfig, lab: Path, show_hidden_categories: bool, verbose: bool) -> ScoringResult:
     """Handles when this tool was launched via the --lab argument."""
-    result = score_lab(config, lab)
+    result = lab_scoring.score_lab(config, lab, check_multiple_matches=verbose)
     for line in scoring.format_result(result, show_hidden_categories):
         _logger.info(line)
     return result
 
 
 def handle_multiple_labs(
-    config: ScoringConfig, lab_container: Path, show_hidden_categories: bool
-) -> dict[str, ScoringResult]:
+    config: ScoringConfig, lab_container: Path, show_hidden_categories: bool, verbose: bool, summary_path: Path
+) -> list[lab_scoring.LabSummary]:
     """
     Handles when this tool was launched via the --labs argument.
-    Returns the lab names map to their individual results.
+    The labs are independent of each other, so they are processed in parallel, in separate processes.
+    The CSV file containing the lab-specific summaries is written while the labs are being processed,
+    but it's only created (or overwritten) if all labs were processed successfully.
+    If a lab fails to be processed, then the labs that haven't been started yet are cancelled,
+    but the ones already handed to a worker process may still be completed.
+    Returns the summaries of the labs.
     """
     lab_names = [p.parent.name for p in lab_container.glob("*/lab.conf")]
     _logger.info("The following labs were found: %s", ", ".join(lab_names))
     out_name = "result-scoring.txt"
     _logger.info("Individual lab results will be written to '*/%s'.", out_name)
+    _logger.info("Summary will be written to '%s'.", summary_path)
+    lab_directories = [lab_container / lab for lab in lab_names]
+    # The matcher is also sent to the worker processes, along with the config
+    matcher = scoring.GroupMatcher.create(config)
+
+    if len(lab_directories) <= 1:
+        # Starting the worker processes would take longer than processing the lab in this process
+        return _save_summaries(
+            summary_path,
+            (
+                lab_scoring.score_and_save_lab(
+                    config, matcher, lab_directory, show_hidden_categories, out_name, verbose
+                )
+                for lab_directory in lab_directories
+            ),
+        )
 
-    results = dict()
-    for lab in lab_names:
-        result = score_lab(config, lab_container / lab)
-        results[lab] = result
-        with (lab_container / lab / out_name).open("w", encoding="utf-8") as f:
-            f.writelines(x + "\n" for x in scoring.format_result(result, show_hidden_categories))
-    return results
-
-
-def save_csv_summary(out_path: Path, results: dict[str, ScoringResult]) -> None:
+    # forkserver avoids starting a fresh interpreter for each worker, but it's not available on all platforms
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=lab_scoring.configure_logging,
+        initargs=(verbose,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                lab_scoring.score_and_save_lab,
+                config,
+                matcher,
+                lab_directory,
+                show_hidden_categories,
+                out_name,
+                verbose,
+            )
+            for lab_directory in lab_directories
+        ]
+        try:
+            # The results are awaited in the order of the labs (unlike as_completed)
+            return _save_summaries(summary_path, (future.result() for future in futures))
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def _save_summaries(summary_path: Path, summaries: Iterable[lab_scoring.LabSummary]) -> list[lab_scoring.LabSummary]:
     """
-    Takes the lab names mapped to their results and saves a CSV file containing lab-specified summaries
-    in the containing folder of the labs.
+    Writes the summaries into a CSV file as they become available. Returns the written summaries.
+    The rows are written into a temporary file, which only replaces the summary file once all summaries are written:
+    an incomplete summary is never left behind if a lab fails.
     """
-    _logger.info("Writing summary to '%s'...", out_path)
-    with out_path.open(mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Lab name", "Earned points", "Max points", "Score percentage"])
-        for lab, res in results.items():
-            writer.writerow([lab, res.earned_points, res.max_points, f"{res.earned_points_percentage:.2f}%"])
+    result: list[lab_scoring.LabSummary] = []
+    temp_path = summary_path.with_name(summary_path.name + ".tmp")
+    try:
+        with temp_path.open(mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Lab name", "Earned points", "Max points", "Score percentage"])
+            for summary in summaries:
+                lab, earned_points, max_points, percentage = summary
+                writer.writerow([lab, earned_points, max_points, f"{percentage:.2f}%"])
+                result.append(summary)
+        temp_path.replace(summary_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return result
 
 
 if __name__ == "__main__":
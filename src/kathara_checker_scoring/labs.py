@@ -0,0 +1,61 @@
+import logging
+from pathlib import Path
+import sys
+
+from kathara_checker_scoring import parsing, scoring
+from kathara_checker_scoring.models import ScoringConfig, ScoringResult
+
+_logger = logging.getLogger(__name__)
+
+LabSummary = tuple[str, int | float, int | float, float]
+"""The lab name, the earned points, the max points and the score percentage of a lab."""
+
+
+def configure_logging(verbose: bool) -> None:
+    """Configures the logging of this process. Also used to configure the worker processes."""
+    logging.basicConfig(
+        force=True,
+        level="DEBUG" if verbose else "INFO",
+        format="%(levelname)s [%(name)s] %(message)s" if verbose else "%(message)s",
+        stream=sys.stdout,
+    )
+
+
+def score_lab(
+    config: ScoringConfig,
+    lab_directory: Path,
+    check_multiple_matches: bool,
+    matcher: scoring.GroupMatcher | None = None,
+) -> ScoringResult:
+    """
+    Loads the records of a single lab and computes its scores.
+    Detecting records that match multiple groups is slower, therefore it can be disabled.
+    The matcher of the config should be provided if multiple labs are scored.
+    """
+    csv_path = lab_directory / f"{lab_directory.name}_result_all.csv"
+    _logger.info("Processing '%s'...", csv_path)
+    try:
+        records = parsing.load_result_all_csv(csv_path)
+        return scoring.score(config, records, check_multiple_matches, matcher)
+    except Exception as e:
+        _logger.debug("Exception caught when processing lab '%s'", lab_directory.name, exc_info=True)
+        _logger.error("Failed to process lab '%s': %s: %s", lab_directory.name, type(e).__name__, e)
+        exit(-1)
+
+
+def score_and_save_lab(
+    config: ScoringConfig,
+    matcher: scoring.GroupMatcher,
+    lab_directory: Path,
+    show_hidden_categories: bool,
+    out_name: str,
+    verbose: bool,
+) -> LabSummary:
+    """
+    Scores a single lab and writes its results into the lab's directory. Might be executed in a worker process.
+    Only the summary of the result is returned, so that the full result doesn't have to be kept in memory.
+    """
+    result = score_lab(config, lab_directory, verbose, matcher)
+    with (lab_directory / out_name).open("w", encoding="utf-8") as f:
+        f.write("\n".join(scoring.format_result(result, show_hidden_categories)) + "\n")
+    return lab_directory.name, result.earned_points, result.max_points, result.earned_points_percentage
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from enum import StrEnum
+from functools import cached_property
 import math
 import re
 
@@ -8,7 +9,7 @@ def _calc_percentage(part: int | float, whole: int | float) -> float:
     return math.nan if whole == 0 else (part / whole) * 100.0
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class LabResultRecord:
     """A parsed line from the <lab>_result_all.csv file, containing the result of a specific check."""
 
@@ -27,12 +28,17 @@ class GroupType(StrEnum):
     ALL = "all"
     ANY = "any"
 
-    def calculate_earned_points(self, group_points: int | float, records: list[LabResultRecord]) -> int | float:
-        count_passed = sum(1 for rec in records if rec.passed)
+    def calculate_earned_points(self, group_points: int | float, count_passed: int, count_total: int) -> int | float:
         if self is GroupType.EACH:
             return group_points * count_passed
         elif self in [GroupType.LINEAR, GroupType.LINEAR_ROUNDED, GroupType.LINEAR_FLOORED]:
-            earned = (count_passed / len(records)) * group_points
+            # Skip the division in the common edge cases, but keep the result a float, as the division would
+            if count_passed == 0:
+                earned = 0.0
+            elif count_passed == count_total:
+                earned = float(group_points)
+            else:
+                earned = (count_passed / count_total) * group_points
             if self is GroupType.LINEAR_ROUNDED:
                 return round(earned)
             elif self is GroupType.LINEAR_FLOORED:
@@ -40,14 +46,14 @@ class GroupType(StrEnum):
             else:
                 return earned
         elif self is GroupType.ALL:
-            return group_points if count_passed == len(records) else 0
+            return group_points if count_passed == count_total else 0
         elif self is GroupType.ANY:
             return group_points if count_passed >= 1 else 0
         raise NotImplementedError(f"Unhandled group type: {self}")
 
-    def calculate_max_points(self, group_points: int | float, records: list[LabResultRecord]) -> int | float:
+    def calculate_max_points(self, group_points: int | float, count_total: int) -> int | float:
         if self is GroupType.EACH:
-            return group_points * len(records)
+            return group_points * count_total
         elif self in [GroupType.LINEAR, GroupType.LINEAR_ROUNDED, GroupType.LINEAR_FLOORED]:
             return group_points
         elif self is GroupType.ALL or self is GroupType.ANY:
@@ -55,7 +61,7 @@ class GroupType(StrEnum):
         raise NotImplementedError(f"Unhandled group type: {self}")
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class CheckGroup:
     """A group of checks which have a common name, their points are calculated together, etc."""
 
@@ -71,11 +77,16 @@ class CheckGroup:
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}('{self.name}')"
 
+    def __eq__(self, other):
+        if not isinstance(other, CheckGroup):
+            return NotImplemented
+        return self.name == other.name and self.category.name == other.category.name
+
     def __hash__(self):
         return hash((self.name, self.category.name))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GroupCategory:
     """A collection of check groups which are displayed and weighted together."""
 
@@ -98,13 +109,13 @@ class ScoringConfig:
 
     @property
     def groups(self) -> list[CheckGroup]:
-        return [group for category in self.categories for group in category.groups]
+        return self._groups
 
     def category_of(self, group: CheckGroup) -> GroupCategory:
-        for cat in self.categories:
-            if group in cat.groups:
-                return cat
-        raise ValueError("The provided group must among this config's groups.")
+        try:
+            return self._group_to_category[group]
+        except KeyError:
+            raise ValueError("The provided group must among this config's groups.") from None
 
     def __post_init__(self):
         if len({category.name for category in self.categories}) != len(self.categories):
@@ -115,6 +126,12 @@ class ScoringConfig:
         if any(len(category.groups) == 0 for category in self.categories):
             raise ValueError("Each category must contain at least one check group")
 
+        # The config is immutable, so these lookups can be computed once (object.__setattr__ bypasses frozen=True)
+        object.__setattr__(self, "_groups", [group for category in self.categories for group in category.groups])
+        object.__setattr__(
+            self, "_group_to_category", {group: category for category in self.categories for group in category.groups}
+        )
+
 
 @dataclass(frozen=True)
 class GroupResult:
@@ -123,31 +140,33 @@ class GroupResult:
     group: CheckGroup
     records: list[LabResultRecord]
 
-    @property
+    @cached_property
     def total_checks_count(self) -> int:
         return len(self.records)
 
-    @property
+    @cached_property
     def passed_checks_count(self) -> int:
-        return sum(1 for record in self.records if record.passed)
+        return sum(record.passed for record in self.records)
 
-    @property
+    @cached_property
     def failed_check_count(self) -> int:
         return self.total_checks_count - self.passed_checks_count
 
-    @property
+    @cached_property
     def max_points(self) -> int | float:
         return self.group.type.calculate_max_points(
-            self.group.points * self.group.category.points_multiplier, self.records
+            self.group.points * self.group.category.points_multiplier, self.total_checks_count
         )
 
-    @property
+    @cached_property
     def earned_points(self) -> int | float:
         return self.group.type.calculate_earned_points(
-            self.group.points * self.group.category.points_multiplier, self.records
+            self.group.points * self.group.category.points_multiplier,
+            self.passed_checks_count,
+            self.total_checks_count,
         )
 
-    @property
+    @cached_property
     def earned_points_percentage(self) -> float:
         return _calc_percentage(self.earned_points, self.max_points)
 
@@ -159,27 +178,27 @@ class CategoryResult:
     category: GroupCategory
     groups: list[GroupResult]
 
-    @property
+    @cached_property
     def total_checks_count(self) -> int:
         return sum(group.total_checks_count for group in self.groups)
 
-    @property
+    @cached_property
     def passed_checks_count(self) -> int:
         return sum(group.passed_checks_count for group in self.groups)
 
-    @property
+    @cached_property
     def failed_check_count(self) -> int:
         return sum(group.failed_check_count for group in self.groups)
 
-    @property
+    @cached_property
     def max_points(self) -> int | float:
         return sum(group.max_points for group in self.groups)
 
-    @property
+    @cached_property
     def earned_points(self) -> int | float:
         return sum(group.earned_points for group in self.groups)
 
-    @property
+    @cached_property
     def earned_points_percentage(self) -> float:
         return _calc_percentage(self.earned_points, self.max_points)
 
@@ -190,26 +209,26 @@ class ScoringResult:
 
     categories: list[CategoryResult]
 
-    @property
+    @cached_property
     def total_checks_count(self) -> int:
         return sum(category.total_checks_count for category in self.categories)
 
-    @property
+    @cached_property
     def passed_checks_count(self) -> int:
         return sum(category.passed_checks_count for category in self.categories)
 
-    @property
+    @cached_property
     def failed_check_count(self) -> int:
         return sum(category.failed_check_count for category in self.categories)
 
-    @property
+    @cached_property
     def max_points(self) -> int | float:
         return sum(category.max_points for category in self.categories)
 
-    @property
+    @cached_property
     def earned_points(self) -> int | float:
         return sum(category.earned_points for category in self.categories)
 
-    @property
+    @cached_property
     def earned_points_percentage(self) -> float:
         return _calc_percentage(self.earned_points, self.max_points)
@@ -1,10 +1,16 @@
+from collections import Counter
+from collections.abc import Callable
 from dataclasses import dataclass
+from functools import cached_property
 import logging
+import re
+
 from kathara_checker_scoring.models import (
     CategoryResult,
     CheckGroup,
     GroupCategory,
     GroupResult,
+    GroupType,
     LabResultRecord,
     ScoringConfig,
     ScoringResult,
@@ -13,44 +19,261 @@ from kathara_checker_scoring.models import (
 _logger = logging.getLogger(__name__)
 
 
+# Backreferences (and conditionals) refer to groups by their index, which changes when patterns are combined
+_GROUP_REFERENCE_REGEX = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def _combine_patterns(patterns: list[re.Pattern], template: str) -> re.Pattern | None:
+    """
+    Combines the patterns into a single one, which matches if and only if any of the patterns match.
+    Each pattern is wrapped using the template, which is formatted with the pattern and its index,
+    e.g. "(?P<_g{index}>{pattern})" captures the first matching pattern in the group named _g<index>.
+    Returns None if the patterns cannot be combined, e.g. because they use backreferences or global flags,
+    or if there are no patterns (an empty pattern would match everything).
+    """
+    if len(patterns) == 0 or any(_GROUP_REFERENCE_REGEX.search(p.pattern) for p in patterns):
+        return None
+    try:
+        return re.compile("|".join(template.format(index=i, pattern=p.pattern) for i, p in enumerate(patterns)))
+    except re.error:
+        return None
+
+
+def _match_first(combined: re.Pattern, pattern_count: int, texts: list[str]) -> list[int]:
+    """
+    Matches the texts against a pattern created by _combine_patterns.
+    Returns the index of the first matching pattern for each text, or -1 if none of them match.
+    """
+    # The capture group of the matching alternative is always the last one to be closed
+    capture_to_pattern = [-1] * (combined.groups + 1)
+    for i in range(pattern_count):
+        capture_to_pattern[combined.groupindex[f"_g{i}"]] = i
+    # map() avoids a bytecode-level call of the bound match method for each text; the rest is still a Python loop
+    return [-1 if m is None else capture_to_pattern[m.lastindex] for m in map(combined.match, texts)]
+
+
+_REGEX_SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+
+
+def _literal_prefix(pattern: re.Pattern) -> str:
+    """
+    Returns the literal text that each description matched by the pattern (via re.match) must start with,
+    e.g. "Checking the " in case of "^Checking the .+$". An empty string is returned if there is no such text.
+    """
+    text = pattern.pattern
+    if pattern.flags & (re.IGNORECASE | re.VERBOSE) or "|" in text:
+        return ""  # Case-insensitivity, comments and alternatives would all need to be parsed
+    i = 1 if text.startswith("^") else 2 if text.startswith("\\A") else 0
+    prefix: list[str] = []
+    while i < len(text):
+        if text[i] == "\\" and i + 1 < len(text) and not text[i + 1].isalnum():
+            prefix.append(text[i + 1])  # Escaped special character, e.g. "\."
+            i += 2
+        elif text[i] not in _REGEX_SPECIAL_CHARS:
+            prefix.append(text[i])
+            i += 1
+        else:
+            if text[i] in "*+?{" or text.startswith("(?#", i):
+                # The last character might be repeated (a comment may be followed by a quantifier), or even absent
+                prefix = prefix[:-1]
+            break
+    return "".join(prefix)
+
+
+@dataclass(frozen=True)
+class GroupMatcher:
+    """
+    Precomputed data used to quickly find the groups of a config that match a description.
+    Groups are referenced by their indices within the config's groups list.
+    When scoring multiple labs with the same config, the matcher should only be created once and then reused.
+    """
+
+    config: ScoringConfig
+    matchers: list[Callable[[str], re.Match | None]]
+    """The match method of each group's pattern."""
+    prefix_trie: dict
+    """Trie of the groups' literal prefixes: nodes map characters to child nodes, "" maps to the groups ending there."""
+    category_filters: list[tuple[re.Pattern | None, list[int]]]
+    """For each category, its groups without a literal prefix and their combined pattern (None if not worth it)."""
+    first_match_pattern: re.Pattern | None
+    """All groups combined (see _match_first). Only present if the prefixes can't narrow down the groups to try."""
+
+    def candidates(self, description: str) -> list[int]:
+        """
+        Returns the indices of the groups that might match the description, in ascending order.
+        Groups with a literal prefix are only included if the description starts with that prefix.
+        The rest of the groups of a category are only included if their combined pattern matches.
+        """
+        node = self.prefix_trie
+        result: list[int] = []
+        for char in description:
+            node = node.get(char)
+            if node is None:
+                break
+            result.extend(node.get("", ()))
+        for category_pattern, unprefixed in self.category_filters:
+            if category_pattern is None or category_pattern.match(description) is not None:
+                result.extend(unprefixed)
+        result.sort()  # First-match semantics: the groups must be tried in their original order
+        return result
+
+    @staticmethod
+    def create(config: ScoringConfig) -> "GroupMatcher":
+        groups = config.groups
+        prefixes = [_literal_prefix(group.description_regex) for group in groups]
+        trie: dict = {}
+        for group_index, prefix in enumerate(prefixes):
+            if prefix:
+                node = trie
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                node.setdefault("", []).append(group_index)
+
+        # The groups of config.groups are ordered by category, so each category owns a range of group indices
+        category_filters: list[tuple[re.Pattern | None, list[int]]] = []
+        start = 0
+        for category in config.categories:
+            end = start + len(category.groups)
+            unprefixed = [i for i in range(start, end) if not prefixes[i]]
+            if len(unprefixed) == 1:
+                category_filters.append((None, unprefixed))  # Filtering would just execute the group's pattern twice
+            elif len(unprefixed) > 1:
+                patterns = [groups[i].description_regex for i in unprefixed]
+                category_filters.append((_combine_patterns(patterns, "(?:{pattern})"), unprefixed))
+            start = end
+
+        return GroupMatcher(
+            config=config,
+            matchers=[group.description_regex.match for group in groups],
+            prefix_trie=trie,
+            category_filters=category_filters,
+            first_match_pattern=(
+                None
+                if any(prefixes)
+                else _combine_patterns([group.description_regex for group in groups], "(?P<_g{index}>{pattern})")
+            ),
+        )
+
+
 @dataclass(frozen=True)
 class RecordGroupMatching:
-    """Calculates/holds the association between checks (records) and groups."""
+    """
+    Calculates/holds the association between checks (records) and groups.
+    The associations are stored as indices into the records and groups lists;
+    the dictionary views are only built when they are needed.
+    """
 
-    record_to_groups: dict[LabResultRecord, list[CheckGroup]]
-    group_to_records: dict[CheckGroup, list[LabResultRecord]]
+    records: list[LabResultRecord]
+    groups: list[CheckGroup]
+    record_to_group_indices: list[list[int]]
+    group_to_record_indices: list[list[int]]
+
+    @cached_property
+    def record_to_groups(self) -> dict[LabResultRecord, list[CheckGroup]]:
+        return {
+            record: [self.groups[i] for i in indices]
+            for record, indices in zip(self.records, self.record_to_group_indices)
+        }
+
+    @cached_property
+    def group_to_records(self) -> dict[CheckGroup, list[LabResultRecord]]:
+        return {
+            group: [self.records[i] for i in indices]
+            for group, indices in zip(self.groups, self.group_to_record_indices)
+        }
 
     def records_matching_multiple_groups(self) -> list[LabResultRecord]:
-        return [record for record, groups in self.record_to_groups.items() if len(groups) > 1]
+        return [record for record, indices in zip(self.records, self.record_to_group_indices) if len(indices) > 1]
 
     def records_without_group(self) -> list[LabResultRecord]:
-        return [record for record, groups in self.record_to_groups.items() if len(groups) == 0]
+        return [record for record, indices in zip(self.records, self.record_to_group_indices) if len(indices) == 0]
 
     def groups_without_records(self) -> list[CheckGroup]:
-        return [group for group, records in self.group_to_records.items() if len(records) == 0]
+        return [group for group, indices in zip(self.groups, self.group_to_record_indices) if len(indices) == 0]
 
     @staticmethod
-    def create(config: ScoringConfig, records: list[LabResultRecord]) -> "RecordGroupMatching":
-        result = RecordGroupMatching(
-            record_to_groups={record: [] for record in records}, group_to_records={group: [] for group in config.groups}
+    def create(
+        config: ScoringConfig,
+        records: list[LabResultRecord],
+        check_multiple_matches: bool = True,
+        matcher: GroupMatcher | None = None,
+    ) -> "RecordGroupMatching":
+        """
+        Matches each record against the groups of the config.
+        If check_multiple_matches is disabled, then each record is only associated with the first group it matches:
+        this is faster, but records matching multiple groups can no longer be detected.
+        The matcher of the config is created if it's not provided.
+        """
+        if matcher is None:
+            matcher = GroupMatcher.create(config)
+        elif matcher.config is not config:
+            raise ValueError("The provided matcher must belong to the provided config.")
+
+        groups = config.groups
+        descriptions = [record.description for record in records]
+        record_to_group_indices: list[list[int]] = [[] for _ in records]
+        group_to_record_indices: list[list[int]] = [[] for _ in groups]
+
+        if not check_multiple_matches and matcher.first_match_pattern is not None:
+            for record_index, group_index in enumerate(
+                _match_first(matcher.first_match_pattern, len(groups), descriptions)
+            ):
+                if group_index >= 0:
+                    record_to_group_indices[record_index].append(group_index)
+                    group_to_record_indices[group_index].append(record_index)
+        else:
+            # Attribute lookups are hoisted out of the loop: they would be executed for each record
+            matchers = matcher.matchers
+            candidates = matcher.candidates
+            for record_index, description in enumerate(descriptions):
+                record_groups = record_to_group_indices[record_index]
+                for group_index in candidates(description):
+                    if matchers[group_index](description) is not None:
+                        record_groups.append(group_index)
+                        group_to_record_indices[group_index].append(record_index)
+                        if not check_multiple_matches:
+                            break
+
+        return RecordGroupMatching(
+            records=records,
+            groups=groups,
+            record_to_group_indices=record_to_group_indices,
+            group_to_record_indices=group_to_record_indices,
         )
-        for group in config.groups:
-            for record in records:
-                if group.matches(record):
-                    result.record_to_groups[record].append(group)
-                    result.group_to_records[group].append(record)
-        return result
 
 
-def score(config: ScoringConfig, records: list[LabResultRecord]) -> ScoringResult:
+def score(
+    config: ScoringConfig,
+    records: list[LabResultRecord],
+    check_multiple_matches: bool = True,
+    matcher: GroupMatcher | None = None,
+) -> ScoringResult:
     """
     Calculates the score of the specified records (read from a kathara-lab-checker CSV)
     and the specified scoring configuration.
     Throws ValueError if these two are not in sync, e.g. some records are not matched by any groups.
+    Records matching multiple groups are only reported if check_multiple_matches is enabled:
+    otherwise such records are assigned to the first group they match.
+    The matcher of the config can be provided to avoid creating it again for each scored lab.
+    Identical (duplicated) records are rejected, as they would be counted multiple times.
     """
-    matching = RecordGroupMatching.create(config, records)
+    duplicates = [record for record, count in Counter(records).items() if count > 1]
+    if len(duplicates) > 0:
+        _logger.error("The following CSV records are duplicated:")
+        _logger.error(", ".join(str(record) for record in duplicates))
+        raise ValueError(f"Some CSV records are duplicated, for example: {duplicates[0]}")
+
+    matching = RecordGroupMatching.create(config, records, check_multiple_matches, matcher)
+
+    # Classify the records in a single pass, instead of calling the separate RecordGroupMatching methods
+    multiple_groups: list[LabResultRecord] = []
+    without_group: list[LabResultRecord] = []
+    for record, group_indices in zip(records, matching.record_to_group_indices):
+        if len(group_indices) > 1:
+            multiple_groups.append(record)
+        elif len(group_indices) == 0:
+            without_group.append(record)
 
-    multiple_groups = matching.records_matching_multiple_groups()
     if len(multiple_groups) > 0:
         _logger.error("The following CSV records match multiple checks groups:")
         _logger.error(", ".join(f"[{record} -> {matching.record_to_groups[record]}]" for record in multiple_groups))
@@ -58,7 +281,6 @@ def score(config: ScoringConfig, records: list[LabResultRecord]) -> ScoringResul
         groups = matching.record_to_groups[record]
         raise ValueError(f"Some CSV records match multiple check groups, for example: {record} -> {groups}")
 
-    without_group = matching.records_without_group()
     if len(without_group) > 0:
         _logger.error("The following CSV records don't match any check groups:")
         _logger.error(", ".join(str(record) for record in without_group))
@@ -88,11 +310,16 @@ def format_result(result: ScoringResult, show_all: bool) -> list[str]:
     The result is provided is a list, where each element is a distinct line, without trailing newlines.
     """
 
-    # Use the same formatting everywhere: don't wary from group-to-group
-    use_float = any(isinstance(group.earned_points, float) for cat in result.categories for group in cat.groups)
-
-    def fmt(number: int | float) -> str:
-        return format(number, ".2f") if use_float else str(number)
+    # Use the same formatting everywhere: don't wary from group-to-group.
+    # The configuration determines whether fractional points are possible, no need to compute any points for this.
+    use_float = any(
+        isinstance(cat.category.points_multiplier, float)
+        or isinstance(group.group.points, float)
+        or group.group.type is GroupType.LINEAR
+        for cat in result.categories
+        for group in cat.groups
+    )
+    fmt = "{:.2f}".format if use_float else str
 
     lines = [
         "Summary:",
@@ -100,6 +327,7 @@ def format_result(result: ScoringResult, show_all: bool) -> list[str]:
         f"   Max: {fmt(result.max_points)}",
         f"Result: {result.earned_points_percentage:.2f}%",
     ]
+    append = lines.append
 
     # Hide categories that have a multiplier of 0.
     # If there is only one non-hidden category, then don't summarize its statistics:
@@ -111,19 +339,19 @@ def format_result(result: ScoringResult, show_all: bool) -> list[str]:
 
     def append_group(group: GroupResult) -> None:
         earned_p, max_p = fmt(group.earned_points), fmt(group.max_points)
-        lines.append(f" - {group.group.name}: {earned_p} out of {max_p} ({group.earned_points_percentage:.2f}%)")
+        append(f" - {group.group.name}: {earned_p} out of {max_p} ({group.earned_points_percentage:.2f}%)")
 
     def append_category(cat: CategoryResult) -> None:
-        header = f"{cat.category.name}:"
         if display_category_summary:
             earned_p, max_p = fmt(cat.earned_points), fmt(cat.max_points)
-            header += f" {earned_p} out of {max_p} ({cat.earned_points_percentage:.2f}%)"
-        lines.append(header)
+            append(f"{cat.category.name}: {earned_p} out of {max_p} ({cat.earned_points_percentage:.2f}%)")
+        else:
+            append(f"{cat.category.name}:")
         for group in cat.groups:
             append_group(group)
 
     for category in shown_categories:
-        lines.append("")
+        append("")
         append_category(category)
 
     return lines